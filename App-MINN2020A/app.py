@@ -1,14 +1,19 @@
-from flask import Flask, render_template, request, redirect, url_for, flash, session
+from flask import Flask, render_template, request, redirect, url_for, flash, session, Response, make_response
+import hashlib
+import importlib.metadata
+import orjson
 import config
-from utils.data_loader import ensure_data_files, load_users
+from utils.data_loader import ensure_data_files
+from utils.user_store import init_db, list_users, EmailTakenError
+from utils.redis_client import get_redis
 from utils.auth import (
     create_user, authenticate, find_user_by_email,
     generate_reset_token, verify_reset_token, reset_password,
     requires_role, unlock_account
 )
-from utils.viz import load_minerals_json, generate_mineral_chart, generate_overview_chart
+from utils.viz import load_minerals_json, generate_mineral_chart, generate_overview_chart, minerals_mtime_ns
 from datetime import timedelta
-from utils.viz import load_minerals_json
+from collections import Counter
 
 import os
 
@@ -16,12 +21,23 @@ app = Flask(__name__)
 app.secret_key = config.SECRET_KEY
 app.permanent_session_lifetime = config.PERMANENT_SESSION_LIFETIME
 
+# Keep session payloads in Redis when configured
+if config.REDIS_URL:
+    from flask_session import Session
+    app.config.update(
+        SESSION_TYPE="redis",
+        SESSION_REDIS=get_redis(),
+        SESSION_PERMANENT=True,
+    )
+    Session(app)
+
 # ----- Setup -----
 ensure_data_files()
+init_db()
 
 # Create initial admin
 def create_initial_admin():
-    users = load_users().get("users", [])
+    users = list_users()
     if not any(u["role"] == "Administrator" for u in users):
         admin = create_user("System", "Admin", "admin@example.com", "SouthAfrica", "MINN", "Administrator", "Admin@1234")
         print("Created default admin user:")
@@ -87,7 +103,12 @@ def signup():
             flash("Administrator accounts must be created by an admin.", "danger")
             return render_template("signup.html")
 
-        new_user = create_user(first_name, last_name, email, country, org, role, password)
+        try:
+            new_user = create_user(first_name, last_name, email, country, org, role, password)
+        except EmailTakenError:
+            # lost a race with a concurrent signup for the same email
+            flash("An account with that email already exists.", "danger")
+            return render_template("signup.html")
         flash(f"Account created. Your username is {new_user['username']}. Please login.", "success")
         return redirect(url_for("login"))
     return render_template("signup.html")
@@ -96,12 +117,9 @@ def signup():
 @app.route("/dashboard/admin")
 @requires_role("Administrator")
 def dashboard_admin():
-    users = load_users().get("users", [])
-    role_counts = {"Administrator": 0, "Investor": 0, "Researcher": 0}
-    for u in users:
-        r = u.get("role")
-        if r in role_counts:
-            role_counts[r] += 1
+    users = list_users()
+    counts = Counter(u.get("role") for u in users)
+    role_counts = {r: counts.get(r, 0) for r in ("Administrator", "Investor", "Researcher")}
     return render_template("dashboard_admin.html", users=users, role_counts=role_counts, form=None)
 
 @app.route("/dashboard/investor")
@@ -155,22 +173,78 @@ def admin_unlock(user_id):
     flash("Account unlocked." if ok else "Could not find user.", "success" if ok else "danger")
     return redirect(url_for("dashboard_admin"))
 
+@app.route("/admin/export/users")
+@requires_role("Administrator")
+def admin_export_users():
+    """Pretty-printed JSON dump of the user store (minus password hashes)."""
+    users = [{k: v for k, v in u.items() if k != "password_hash"} for u in list_users()]
+    return Response(orjson.dumps({"users": users}, option=orjson.OPT_INDENT_2), mimetype="application/json")
+
 # ---- Minerals Dashboard ----
-from utils.viz import load_minerals_json, generate_mineral_chart, generate_overview_chart
+def _minerals_page_fingerprint():
+    """
+    Hash of everything besides minerals.json that shapes the minerals pages: this module
+    (render context), the templates, the chart code and the installed plotly version (its
+    CDN URL is baked into the chart HTML). Same files -> same value in every worker.
+    """
+    h = hashlib.sha1(config.APP_VERSION.encode("utf-8"))
+    for path in (
+        os.path.abspath(__file__),
+        os.path.join(app.root_path, "templates", "base.html"),
+        os.path.join(app.root_path, "templates", "minerals_dashboard.html"),
+        os.path.join(app.root_path, "utils", "viz.py"),
+    ):
+        with open(path, "rb") as f:
+            h.update(f.read())
+    try:
+        h.update(importlib.metadata.version("plotly").encode("utf-8"))
+    except importlib.metadata.PackageNotFoundError:
+        pass
+    return h.hexdigest()
+
+# Computed once at import; per request only minerals.json is stat()ed
+_MINERALS_PAGE_FINGERPRINT = _minerals_page_fingerprint()
+
+def minerals_page_version():
+    return f"{_MINERALS_PAGE_FINGERPRINT}:{minerals_mtime_ns()}"
+
+def conditional_minerals_page(render):
+    """
+    Serve a minerals page with an ETag built from minerals_page_version() and the viewer
+    (the navbar shows the logged-in user), answering 304 without rendering when it matches.
+    Marked private + no-cache: browsers revalidate every time, shared caches never store it.
+    """
+    if session.get("_flashes"):
+        # pending flash messages are rendered into the page; don't swallow them with a 304
+        return render()
+    raw = f"{minerals_page_version()}:{session.get('username', '')}:{session.get('role', '')}"
+    etag = hashlib.sha1(raw.encode("utf-8")).hexdigest()
+    if etag in request.if_none_match:
+        resp = make_response("", 304)
+    else:
+        resp = make_response(render())
+    resp.set_etag(etag)
+    resp.cache_control.private = True
+    resp.cache_control.no_cache = True
+    return resp
 
 @app.route("/minerals")
 def minerals_dashboard():
     """Display list of minerals with overview chart."""
-    minerals = load_minerals_json()
-    chart_html = generate_overview_chart()
-    return render_template("minerals_dashboard.html", minerals=minerals, chart_html=chart_html)
+    def render():
+        minerals = load_minerals_json()
+        chart_html = generate_overview_chart()
+        return render_template("minerals_dashboard.html", minerals=minerals, chart_html=chart_html)
+    return conditional_minerals_page(render)
 
 
 @app.route("/minerals/<mineral_name>")
 def mineral_detail_chart(mineral_name):
     """Display individual mineral chart."""
-    chart_html = generate_mineral_chart(mineral_name)
-    return render_template("minerals_dashboard.html", chart_html=chart_html, single=True, mineral_name=mineral_name)
+    def render():
+        chart_html = generate_mineral_chart(mineral_name)
+        return render_template("minerals_dashboard.html", chart_html=chart_html, single=True, mineral_name=mineral_name)
+    return conditional_minerals_page(render)
 
 
 if __name__ == "__main__":
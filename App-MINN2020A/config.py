@@ -4,17 +4,26 @@ from datetime import timedelta
 # Basic config - change SECRET_KEY to an env var in production
 SECRET_KEY = os.environ.get("SECRET_KEY", "replace_this_with_a_secret_in_prod")
 DATA_DIR = os.path.join(os.path.dirname(__file__), "data")
-USERS_FILE = os.path.join(DATA_DIR, "users.json")
-LOGS_FILE = os.path.join(DATA_DIR, "logs.json")
+USERS_DB = os.path.join(DATA_DIR, "users.db")  # SQLite user store (WAL mode)
+USERS_FILE = os.path.join(DATA_DIR, "users.json")  # legacy store, imported into USERS_DB on first run
+LOGS_FILE = os.path.join(DATA_DIR, "logs.jsonl")  # JSON Lines: one event per line, append-only
 
 # Security settings
 PASSWORD_RESET_SALT = "password-reset-salt"
 PASSWORD_RESET_EXP_SECONDS = 3600  # 1 hour
 MAX_FAILED_LOGIN = 5
 LOCKOUT_SECONDS = 15 * 60  # 15 minutes
+BCRYPT_ROUNDS = int(os.environ.get("BCRYPT_ROUNDS", "12"))  # bcrypt cost factor (2^rounds iterations)
 
 # Identity generation settings
 USER_ID_PREFIX = "MINN"  # application code prefix for user id
 
+# Optional deployment version (e.g. git sha), mixed into the minerals pages' ETag fingerprint
+APP_VERSION = os.environ.get("APP_VERSION", "")
+
 # Flask session lifetime
 PERMANENT_SESSION_LIFETIME = timedelta(hours=8)
+
+# Server-side sessions in Redis (Flask-Session); the cookie then only carries a session id.
+# Leave unset to fall back to Flask's signed-cookie sessions (e.g. local dev without Redis).
+REDIS_URL = os.environ.get("REDIS_URL")
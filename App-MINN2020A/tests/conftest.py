@@ -0,0 +1,21 @@
+import os
+import sys
+
+import pytest
+
+# Make `config` and `utils` importable the same way app.py sees them
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from utils import user_store  # noqa: E402
+
+
+@pytest.fixture
+def store(tmp_path, monkeypatch):
+    """user_store pointed at an empty, freshly initialised database under tmp_path."""
+    monkeypatch.setattr(user_store, "USERS_DB", str(tmp_path / "users.db"))
+    monkeypatch.setattr(user_store, "USERS_FILE", str(tmp_path / "users.json"))
+    monkeypatch.setattr(user_store._local, "conn", None, raising=False)
+    user_store.init_db()
+    yield user_store
+    user_store._local.conn.close()
+    user_store._local.conn = None
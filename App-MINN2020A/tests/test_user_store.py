@@ -0,0 +1,98 @@
+import sqlite3
+
+import orjson
+import pytest
+
+from utils import user_store
+
+
+def make_user(n, **overrides):
+    user = {
+        "user_id": f"MINN251016AB{n:04d}00",
+        "username": f"ab.cd.ken{n}",
+        "first_name": "Ab",
+        "last_name": "Cd",
+        "email": f"User{n}@Example.com",
+        "country": "Kenya",
+        "organization": "",
+        "role": "Researcher",
+        "password_hash": "$2b$12$hash",
+        "created_at": f"2025-10-16T06:13:{n:02d}.000000Z",
+        "failed_logins": 0,
+        "locked_until": None,
+    }
+    user.update(overrides)
+    return user
+
+
+def test_max_username_suffix_ignores_non_ascii_digits(store):
+    store.insert_user(make_user(1, username="ja.do.k"))
+    store.insert_user(make_user(2, username="ja.do.k3"))
+    # built from a country like "K1²": isalnum() keeps "²", which int() can't parse
+    store.insert_user(make_user(3, username="ja.do.k1²"))
+    assert store.max_username_suffix("ja.do.k") == 3
+
+
+def test_migrate_from_json_imports_once(store, tmp_path):
+    path = tmp_path / "legacy_users.json"
+    legacy = make_user(1, failed_logins=None)
+    path.write_bytes(orjson.dumps({"users": [legacy, make_user(2)]}))
+
+    assert store.migrate_from_json(str(path)) == 2
+    assert store.migrate_from_json(str(path)) == 0  # existing users are skipped
+    assert store.get_user_by_email("user1@example.com")["failed_logins"] == 0
+    assert [u["username"] for u in store.list_users()] == ["ab.cd.ken1", "ab.cd.ken2"]
+
+
+def test_transaction_rolls_back_on_error(store):
+    with pytest.raises(RuntimeError):
+        with user_store._transaction() as conn:
+            conn.execute("INSERT INTO users (user_id, username, email, email_lower, role, password_hash) "
+                         "VALUES ('x', 'x', 'x@y', 'x@y', 'Researcher', 'h')")
+            raise RuntimeError("boom")
+    assert store.get_user_by_id("x") is None
+    # the connection is usable (no transaction left open)
+    store.insert_user(make_user(1))
+    assert store.get_user_by_id(make_user(1)["user_id"]) is not None
+
+
+def test_insert_user_conflicts(store):
+    store.insert_user(make_user(1))
+    with pytest.raises(store.EmailTakenError):
+        store.insert_user(make_user(2, email="USER1@example.com"))
+    with pytest.raises(sqlite3.IntegrityError):
+        store.insert_user(make_user(3, username="ab.cd.ken1"))
+
+
+def test_update_user_and_update_by_email(store):
+    user = make_user(1)
+    store.insert_user(user)
+
+    assert store.update_user(user["user_id"], email="New@Example.com", failed_logins=2)
+    assert store.get_user_by_email("new@example.com")["failed_logins"] == 2
+    assert store.get_user_by_email("user1@example.com") is None
+
+    updated = store.update_user_by_email("NEW@example.com", failed_logins=0, locked_until="2030-01-01T00:00:00Z")
+    assert updated["user_id"] == user["user_id"]
+    assert updated["locked_until"] == "2030-01-01T00:00:00Z"
+
+    assert store.update_user("missing", failed_logins=0) is False
+    assert store.update_user_by_email("missing@example.com", failed_logins=0) is None
+    with pytest.raises(ValueError):
+        store.update_user(user["user_id"], email_lower="sneaky")
+
+
+def test_increment_failed_logins(store):
+    user = make_user(1)
+    store.insert_user(user)
+    assert store.increment_failed_logins(user["user_id"]) == 1
+    assert store.increment_failed_logins(user["user_id"]) == 2
+    assert store.get_user_by_id(user["user_id"])["failed_logins"] == 2
+    assert store.increment_failed_logins("missing") == 0
+
+
+def test_user_ids_with_prefix_treats_prefix_literally(store):
+    store.insert_user(make_user(1, user_id="MINN251016[A123400"))
+    store.insert_user(make_user(2, user_id="MINN251016AB567800"))
+    assert store.user_ids_with_prefix("MINN251016[A") == {"MINN251016[A123400"}
+    assert store.user_ids_with_prefix("MINN251016*") == set()
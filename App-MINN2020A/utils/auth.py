@@ -5,18 +5,31 @@ authentication, lockout, password reset tokens, and role decorator.
 
 import bcrypt
 import secrets
+import sqlite3
 import time
 from itsdangerous import URLSafeTimedSerializer, BadSignature, SignatureExpired
 from flask import session, redirect, url_for, request, flash
 from functools import wraps
-from datetime import datetime
+from datetime import datetime, timedelta, timezone
 
 import config
-from utils.data_loader import load_users, save_users, append_log
+from utils.data_loader import append_log
+from utils import user_store
+from utils.redis_client import get_redis
 
 SECRET = config.SECRET_KEY
 s = URLSafeTimedSerializer(SECRET)
 
+def _iso(dt: datetime) -> str:
+    """UTC isoformat with a trailing Z, the format used for every stored/logged timestamp."""
+    return dt.isoformat().replace("+00:00", "Z")
+
+def _now_iso() -> str:
+    return _iso(datetime.now(timezone.utc))
+
+# Checked against on unknown usernames so a failed lookup costs the same as a wrong password
+_DUMMY_HASH = bcrypt.hashpw(b"dummy-password", bcrypt.gensalt(rounds=config.BCRYPT_ROUNDS))
+
 # -------------------------
 # Utilities (identity)
 # -------------------------
@@ -27,9 +40,10 @@ def generate_user_id(first_name: str, last_name: str, country: str) -> str:
     Example: MINN250715AB4829C
     We ensure uniqueness by checking existing users.
     """
-    users = load_users().get("users", [])
-    base_date = datetime.utcnow().strftime("%y%m%d")
+    base_date = datetime.now(timezone.utc).strftime("%y%m%d")
     initials = (first_name[:1] + last_name[:1]).upper()
+    # every candidate shares this prefix, so fetch the taken ids once instead of querying per attempt
+    existing_ids = user_store.user_ids_with_prefix(f"{config.USER_ID_PREFIX}{base_date}{initials}")
     attempt = 0
     while True:
         rand4 = secrets.randbelow(10000)
@@ -37,13 +51,13 @@ def generate_user_id(first_name: str, last_name: str, country: str) -> str:
         # simple checksum: mod 97
         checksum = sum(ord(c) for c in core) % 97
         user_id = f"{core}{checksum:02d}"
-        if not any(u.get("user_id") == user_id for u in users):
+        if user_id not in existing_ids:
             return user_id
         attempt += 1
         if attempt > 50:
             # fallback - add timestamp
             user_id = f"{core}{int(time.time())%10000}"
-            if not any(u.get("user_id") == user_id for u in users):
+            if user_id not in existing_ids:
                 return user_id
 
 def generate_username(first_name: str, last_name: str, country: str, org: str = "") -> str:
@@ -52,18 +66,19 @@ def generate_username(first_name: str, last_name: str, country: str, org: str =
     format: firstname.lastname.countrycode[.orgshort][NNN]
     ensures uniqueness by appending numbers if needed.
     """
-    users = load_users().get("users", [])
     fn = ''.join(ch for ch in first_name.lower() if ch.isalnum())
     ln = ''.join(ch for ch in last_name.lower() if ch.isalnum())
     cc = ''.join(ch for ch in country.lower() if ch.isalnum())[:3]
     orgshort = ''.join(ch for ch in org.lower() if ch.isalnum())[:3] if org else ""
     base = f"{fn}.{ln}.{cc}" + (f".{orgshort}" if orgshort else "")
-    username = base
-    suffix = 1
-    existing = {u["username"] for u in users}
-    while username in existing:
-        username = f"{base}{suffix}"
+    if not user_store.username_exists(base):
+        return base
+    # continue after the highest suffix already taken instead of probing from 1
+    suffix = user_store.max_username_suffix(base) + 1
+    username = f"{base}{suffix}"
+    while user_store.username_exists(username):
         suffix += 1
+        username = f"{base}{suffix}"
     return username
 
 # -------------------------
@@ -71,40 +86,56 @@ def generate_username(first_name: str, last_name: str, country: str, org: str =
 # -------------------------
 def hash_password(plain: str) -> str:
     """Return bcrypt hash (utf-8 string)"""
-    hashed = bcrypt.hashpw(plain.encode("utf-8"), bcrypt.gensalt())
+    hashed = bcrypt.hashpw(plain.encode("utf-8"), bcrypt.gensalt(rounds=config.BCRYPT_ROUNDS))
     return hashed.decode("utf-8")
 
 def check_password(plain: str, hashed: str) -> bool:
     return bcrypt.checkpw(plain.encode("utf-8"), hashed.encode("utf-8"))
 
+def password_needs_rehash(hashed: str) -> bool:
+    """True if the hash was made with a different cost than BCRYPT_ROUNDS ($2b$<rounds>$...)."""
+    try:
+        return int(hashed.split("$")[2]) != config.BCRYPT_ROUNDS
+    except (IndexError, ValueError):
+        return True
+
 # -------------------------
 # User management
 # -------------------------
+CREATE_USER_ATTEMPTS = 5
+
 def create_user(first_name, last_name, email, country, org, role, password):
-    # load user store
-    data = load_users()
-    users = data.setdefault("users", [])
-    # generate identity values
-    user_id = generate_user_id(first_name, last_name, country)
-    username = generate_username(first_name, last_name, country, org)
+    """
+    Create and store a new user. Raises user_store.EmailTakenError if the email is
+    already registered (e.g. by a concurrent signup that won the race).
+    """
     pw_hash = hash_password(password)
-    created_at = datetime.utcnow().isoformat() + "Z"
-    new_user = {
-        "user_id": user_id,
-        "username": username,
-        "first_name": first_name,
-        "last_name": last_name,
-        "email": email,
-        "country": country,
-        "organization": org,
-        "role": role,
-        "password_hash": pw_hash,
-        "created_at": created_at,
-        "failed_logins": 0,
-        "locked_until": None
-    }
-    users.append(new_user)
-    save_users(data)
+    created_at = _now_iso()
+    for attempt in range(CREATE_USER_ATTEMPTS):
+        # generate identity values
+        user_id = generate_user_id(first_name, last_name, country)
+        username = generate_username(first_name, last_name, country, org)
+        new_user = {
+            "user_id": user_id,
+            "username": username,
+            "first_name": first_name,
+            "last_name": last_name,
+            "email": email,
+            "country": country,
+            "organization": org,
+            "role": role,
+            "password_hash": pw_hash,
+            "created_at": created_at,
+            "failed_logins": 0,
+            "locked_until": None
+        }
+        try:
+            user_store.insert_user(new_user)
+            break
+        except sqlite3.IntegrityError:
+            # another worker took this username/user_id between generating and inserting
+            if attempt == CREATE_USER_ATTEMPTS - 1:
+                raise
     append_log({
         "timestamp": created_at,
         "event": "user_created",
@@ -116,49 +147,76 @@ def create_user(first_name, last_name, email, country, org, role, password):
     return new_user
 
 def find_user_by_username(username):
-    users = load_users().get("users", [])
-    for u in users:
-        if u["username"] == username:
-            return u
-    return None
+    return user_store.get_user_by_username(username)
 
 def find_user_by_email(email):
-    users = load_users().get("users", [])
-    for u in users:
-        if u["email"].lower() == email.lower():
-            return u
-    return None
+    return user_store.get_user_by_email(email)
+
+# -------------------------
+# Lockout state
+# -------------------------
+# With Redis configured, failed attempts are counted in Redis (fail:<user_id>) and
+# the lock itself is a TTL key (lock:<user_id>), so a flood of bad passwords never
+# touches the user store. locked_until is still written to the store once per lockout
+# so the admin dashboard can show and unlock it.
+def _fail_key(user_id):
+    return f"fail:{user_id}"
+
+def _lock_key(user_id):
+    return f"lock:{user_id}"
+
+def _lock_active(locked_until) -> bool:
+    if not locked_until:
+        return False
+    try:
+        # stored as isoformat with a trailing Z; spell it +00:00 so Python < 3.11 parses it too
+        locked_ts = datetime.fromisoformat(locked_until.replace("Z", "+00:00"))
+    except (TypeError, ValueError):
+        # fail closed: a corrupt value keeps the account locked until an admin unlocks it
+        return True
+    if locked_ts.tzinfo is None:
+        locked_ts = locked_ts.replace(tzinfo=timezone.utc)
+    return locked_ts > datetime.now(timezone.utc)
+
+def _clear_lockout(user) -> None:
+    """Reset failed attempts / lock for user (only writes the store if something is set)."""
+    r = get_redis()
+    if r is not None:
+        r.delete(_fail_key(user["user_id"]), _lock_key(user["user_id"]))
+    if user.get("failed_logins") or user.get("locked_until"):
+        user_store.update_user(user["user_id"], failed_logins=0, locked_until=None)
 
 # -------------------------
 # Authentication + lockout
 # -------------------------
 def authenticate(username, password, remote_ip=None):
     """Authenticate and handle failed attempts / lockout."""
-    data = load_users()
-    users = data.get("users", [])
     user = find_user_by_username(username)
-    now = datetime.utcnow().isoformat() + "Z"
+    now_dt = datetime.now(timezone.utc)
+    now = _iso(now_dt)
     if user is None:
+        # equalize timing with the wrong-password path (prevents username enumeration)
+        bcrypt.checkpw(password.encode("utf-8"), _DUMMY_HASH)
         append_log({"timestamp": now, "event": "login_failed", "username": username, "reason": "no_user", "ip": remote_ip})
         return False, "Invalid credentials."
 
+    r = get_redis()
     # check lockout
     locked_until = user.get("locked_until")
-    if locked_until:
-        try:
-            # stored as isoformat
-            locked_ts = datetime.fromisoformat(locked_until.replace("Z", ""))
-        except Exception:
-            locked_ts = None
-        if locked_ts and locked_ts > datetime.utcnow():
-            append_log({"timestamp": now, "event": "login_blocked", "user_id": user["user_id"], "reason": "locked", "ip": remote_ip})
-            return False, f"Account locked until {locked_until} UTC."
+    if r is not None:
+        locked = bool(r.exists(_lock_key(user["user_id"])))
+    else:
+        locked = _lock_active(locked_until)
+    if locked:
+        append_log({"timestamp": now, "event": "login_blocked", "user_id": user["user_id"], "reason": "locked", "ip": remote_ip})
+        return False, f"Account locked until {locked_until} UTC."
 
     if check_password(password, user["password_hash"]):
         # reset failed attempts
-        user["failed_logins"] = 0
-        user["locked_until"] = None
-        save_users(data)
+        _clear_lockout(user)
+        # upgrade the stored hash if BCRYPT_ROUNDS changed since it was created
+        if password_needs_rehash(user["password_hash"]):
+            user_store.update_user(user["user_id"], password_hash=hash_password(password))
         session["username"] = user["username"]
         session["role"] = user["role"]
         session["user_id"] = user["user_id"]
@@ -166,17 +224,25 @@ def authenticate(username, password, remote_ip=None):
         return True, "Authenticated"
     else:
         # increment failed
-        user["failed_logins"] = user.get("failed_logins", 0) + 1
-        if user["failed_logins"] >= config.MAX_FAILED_LOGIN:
+        if r is not None:
+            pipe = r.pipeline()
+            pipe.incr(_fail_key(user["user_id"]))
+            pipe.expire(_fail_key(user["user_id"]), config.LOCKOUT_SECONDS)
+            attempts = pipe.execute()[0]
+        else:
+            attempts = user_store.increment_failed_logins(user["user_id"])
+        locked = attempts >= config.MAX_FAILED_LOGIN
+        if locked:
             # lock account
-            lock_until = (datetime.utcnow().timestamp() + config.LOCKOUT_SECONDS)
             # store isoformat
-            user["locked_until"] = datetime.utcfromtimestamp(lock_until).isoformat() + "Z"
+            user["locked_until"] = _iso(now_dt + timedelta(seconds=config.LOCKOUT_SECONDS))
+            user_store.update_user(user["user_id"], locked_until=user["locked_until"])
+            if r is not None:
+                r.set(_lock_key(user["user_id"]), 1, ex=config.LOCKOUT_SECONDS)
             append_log({"timestamp": now, "event": "account_locked", "user_id": user["user_id"], "username": user["username"], "ip": remote_ip})
         else:
-            append_log({"timestamp": now, "event": "login_failed", "user_id": user["user_id"], "username": user["username"], "attempts": user["failed_logins"], "ip": remote_ip})
-        save_users(data)
-        if user["failed_logins"] >= config.MAX_FAILED_LOGIN:
+            append_log({"timestamp": now, "event": "login_failed", "user_id": user["user_id"], "username": user["username"], "attempts": attempts, "ip": remote_ip})
+        if locked:
             return False, f"Too many failed attempts. Account locked until {user['locked_until']} UTC."
         return False, "Invalid credentials."
 
@@ -199,17 +265,15 @@ def verify_reset_token(token: str, max_age: int = None) -> str:
         return None
 
 def reset_password(email: str, new_password: str):
-    data = load_users()
-    users = data.get("users", [])
-    for u in users:
-        if u["email"].lower() == email.lower():
-            u["password_hash"] = hash_password(new_password)
-            u["failed_logins"] = 0
-            u["locked_until"] = None
-            save_users(data)
-            append_log({"timestamp": datetime.utcnow().isoformat()+"Z", "event": "password_reset", "user_id": u["user_id"], "username": u["username"]})
-            return True
-    return False
+    # one indexed UPDATE sets the new hash and clears the stored lockout together
+    u = user_store.update_user_by_email(
+        email, password_hash=hash_password(new_password), failed_logins=0, locked_until=None
+    )
+    if u is None:
+        return False
+    _clear_lockout(u)  # Redis counters, if any
+    append_log({"timestamp": _now_iso(), "event": "password_reset", "user_id": u["user_id"], "username": u["username"]})
+    return True
 
 # -------------------------
 # Role decorator
@@ -235,13 +299,9 @@ def requires_role(roles):
 # Admin-only helper
 # -------------------------
 def unlock_account(user_id: str) -> bool:
-    data = load_users()
-    users = data.get("users", [])
-    for u in users:
-        if u["user_id"] == user_id:
-            u["failed_logins"] = 0
-            u["locked_until"] = None
-            save_users(data)
-            append_log({"timestamp": datetime.utcnow().isoformat()+"Z", "event": "account_unlocked", "user_id": user_id, "by": "admin"})
-            return True
-    return False
+    u = user_store.get_user_by_id(user_id)
+    if u is None:
+        return False
+    _clear_lockout(u)
+    append_log({"timestamp": _now_iso(), "event": "account_unlocked", "user_id": user_id, "by": "admin"})
+    return True
@@ -1,33 +1,24 @@
-import json
 import os
+import orjson
 from typing import Dict, Any
 
-from config import USERS_FILE, LOGS_FILE
+from config import LOGS_FILE
+
+# ensure_data_files() is called once at app startup; later calls are a flag check
+_ENSURED = False
 
 def ensure_data_files():
-    """Create data directory + empty files if missing."""
-    os.makedirs(os.path.dirname(USERS_FILE), exist_ok=True)
-    if not os.path.exists(USERS_FILE):
-        with open(USERS_FILE, "w") as f:
-            json.dump({"users": []}, f, indent=2)
+    """Create data directory + empty log file if missing (users live in utils.user_store)."""
+    global _ENSURED
+    if _ENSURED:
+        return
+    os.makedirs(os.path.dirname(LOGS_FILE), exist_ok=True)
     if not os.path.exists(LOGS_FILE):
-        with open(LOGS_FILE, "w") as f:
-            json.dump({"logs": []}, f, indent=2)
-
-def load_users() -> Dict[str, Any]:
-    ensure_data_files()
-    with open(USERS_FILE, "r") as f:
-        return json.load(f)
-
-def save_users(data: Dict[str, Any]) -> None:
-    with open(USERS_FILE, "w") as f:
-        json.dump(data, f, indent=2)
+        open(LOGS_FILE, "a").close()
+    _ENSURED = True
 
 def append_log(entry: Dict[str, Any]) -> None:
-    """Append a log entry to logs.json"""
-    ensure_data_files()
-    with open(LOGS_FILE, "r") as f:
-        logs = json.load(f)
-    logs.setdefault("logs", []).append(entry)
-    with open(LOGS_FILE, "w") as f:
-        json.dump(logs, f, indent=2)
+    """Append a log entry as a single line to logs.jsonl (no read-modify-write)."""
+    line = orjson.dumps(entry) + b"\n"
+    with open(LOGS_FILE, "ab") as f:
+        f.write(line)
@@ -3,37 +3,47 @@ utils/map_utils.py
 Generates Folium maps for African mineral sites.
 """
 
-import folium
 import os
 from config import DATA_DIR
+from utils.viz import load_minerals_json, minerals_mtime_ns
 
 
-def generate_africa_mineral_map(minerals):
+def generate_africa_mineral_map():
     """
-    Build a Folium map showing mineral deposits across Africa.
+    Build a Folium map showing mineral deposits across Africa from minerals.json.
     Each mineral entry may include 'deposits' with lat/lon coordinates.
     Returns the absolute path to the generated HTML map.
+
+    The saved HTML is reused while it is newer than minerals.json.
     """
     map_path = os.path.join(DATA_DIR, "africa_minerals_map.html")
+    if os.path.exists(map_path) and os.stat(map_path).st_mtime_ns >= minerals_mtime_ns():
+        return map_path
+
+    import folium  # heavy; only load it when a map is actually built
+
+    minerals = load_minerals_json()
 
     # Center the map on Africa
     m = folium.Map(location=[0, 20], zoom_start=3, tiles="cartodb positron")
 
-    # Add deposits (only if coordinates exist)
+    # Add deposits (only if coordinates exist), all sharing one style, in a single layer
+    marker_style = dict(radius=5, color="#007bff", fill=True, fill_opacity=0.7)
+    deposits = folium.FeatureGroup(name="Deposits")
     for mineral in minerals:
-        color = "#007bff"
         for dep in mineral.get("deposits", []):
             lat = dep.get("lat")
             lon = dep.get("lon")
             if lat and lon:
                 folium.CircleMarker(
                     location=[lat, lon],
-                    radius=5,
                     popup=f"{mineral['name']}<br>{dep.get('site','Unknown')}, {dep.get('country','')}",
-                    color=color,
-                    fill=True,
-                    fill_opacity=0.7
-                ).add_to(m)
+                    **marker_style
+                ).add_to(deposits)
+    deposits.add_to(m)
 
-    m.save(map_path)
+    # save under a temp name so a half-written file is never mistaken for a fresh map
+    tmp_path = map_path + ".tmp.html"
+    m.save(tmp_path)
+    os.replace(tmp_path, map_path)
     return map_path
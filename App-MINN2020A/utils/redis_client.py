@@ -0,0 +1,17 @@
+"""
+utils/redis_client.py
+Shared Redis connection used for server-side sessions and login lockout counters.
+"""
+
+import config
+
+_client = None
+
+
+def get_redis():
+    """Return a Redis client for config.REDIS_URL, or None if Redis isn't configured."""
+    global _client
+    if _client is None and config.REDIS_URL:
+        import redis
+        _client = redis.Redis.from_url(config.REDIS_URL, socket_timeout=1)
+    return _client
@@ -0,0 +1,218 @@
+"""
+utils/user_store.py
+SQLite (WAL mode) user store. Replaces the users.json read-modify-write cycle with
+indexed lookups and row-level updates that are safe across multiple workers.
+
+Run `python -m utils.user_store` to import an existing data/users.json by hand;
+init_db() also does this automatically the first time it sees an empty database.
+"""
+
+import os
+import sqlite3
+import threading
+from contextlib import contextmanager
+from typing import Dict, Any, List, Optional, Set
+
+import orjson
+from config import USERS_DB, USERS_FILE
+
+# Columns of a user record, in the order used by the old users.json entries
+USER_FIELDS = (
+    "user_id", "username", "first_name", "last_name", "email", "country",
+    "organization", "role", "password_hash", "created_at", "failed_logins", "locked_until",
+)
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS users (
+    user_id       TEXT PRIMARY KEY,
+    username      TEXT NOT NULL UNIQUE,
+    first_name    TEXT,
+    last_name     TEXT,
+    email         TEXT NOT NULL,
+    email_lower   TEXT NOT NULL UNIQUE,
+    country       TEXT,
+    organization  TEXT,
+    role          TEXT NOT NULL,
+    password_hash TEXT NOT NULL,
+    created_at    TEXT,
+    failed_logins INTEGER NOT NULL DEFAULT 0,
+    locked_until  TEXT
+)
+"""
+
+class EmailTakenError(Exception):
+    """Raised by insert_user when another account already uses the email (case-insensitive)."""
+
+
+_SELECT = f"SELECT {', '.join(USER_FIELDS)} FROM users"
+
+# One connection per thread; sqlite3 connections shouldn't be shared across threads
+_local = threading.local()
+
+
+def _connect() -> sqlite3.Connection:
+    conn = getattr(_local, "conn", None)
+    if conn is None:
+        os.makedirs(os.path.dirname(USERS_DB), exist_ok=True)
+        conn = sqlite3.connect(USERS_DB, isolation_level=None, timeout=10)
+        conn.row_factory = sqlite3.Row
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute("PRAGMA synchronous=NORMAL")
+        _local.conn = conn
+    return conn
+
+
+@contextmanager
+def _transaction():
+    """
+    BEGIN IMMEDIATE ... COMMIT on this thread's connection. Used instead of
+    UPDATE ... RETURNING, which needs SQLite 3.35+ (older system libsqlite3 builds lack it).
+    """
+    conn = _connect()
+    conn.execute("BEGIN IMMEDIATE")
+    try:
+        yield conn
+        conn.execute("COMMIT")
+    except Exception:
+        conn.execute("ROLLBACK")
+        raise
+
+
+def _row_to_user(row) -> Optional[Dict[str, Any]]:
+    return dict(row) if row is not None else None
+
+
+def init_db() -> None:
+    """Create the users table and import users.json if the table is still empty."""
+    conn = _connect()
+    conn.execute(SCHEMA)
+    if conn.execute("SELECT 1 FROM users LIMIT 1").fetchone() is None and os.path.exists(USERS_FILE):
+        migrate_from_json(USERS_FILE)
+
+
+def migrate_from_json(path: str) -> int:
+    """Insert every user from a users.json file; existing usernames/emails/ids are skipped."""
+    with open(path, "rb") as f:
+        users = orjson.loads(f.read()).get("users", [])
+    inserted = 0
+    with _transaction() as conn:
+        for u in users:
+            cur = conn.execute(
+                f"INSERT OR IGNORE INTO users ({', '.join(USER_FIELDS)}, email_lower) "
+                f"VALUES ({', '.join('?' for _ in USER_FIELDS)}, ?)",
+                [u.get(k) if k != "failed_logins" else (u.get(k) or 0) for k in USER_FIELDS]
+                + [u["email"].lower()],
+            )
+            inserted += cur.rowcount
+    return inserted
+
+
+# -------------------------
+# Lookups
+# -------------------------
+def get_user_by_username(username: str) -> Optional[Dict[str, Any]]:
+    return _row_to_user(_connect().execute(f"{_SELECT} WHERE username = ?", (username,)).fetchone())
+
+
+def get_user_by_email(email: str) -> Optional[Dict[str, Any]]:
+    return _row_to_user(_connect().execute(f"{_SELECT} WHERE email_lower = ?", (email.lower(),)).fetchone())
+
+
+def get_user_by_id(user_id: str) -> Optional[Dict[str, Any]]:
+    return _row_to_user(_connect().execute(f"{_SELECT} WHERE user_id = ?", (user_id,)).fetchone())
+
+
+def username_exists(username: str) -> bool:
+    return _connect().execute("SELECT 1 FROM users WHERE username = ?", (username,)).fetchone() is not None
+
+
+def user_ids_with_prefix(prefix: str) -> Set[str]:
+    """All user_ids starting with prefix (an index range scan, not a table scan)."""
+    # a plain range instead of GLOB/LIKE: the initials in prefix come from the signup form
+    # and may contain pattern characters. Generated ids continue prefix with digits, which
+    # all sort below prefix + U+FFFF.
+    rows = _connect().execute(
+        "SELECT user_id FROM users WHERE user_id >= ? AND user_id < ?",
+        (prefix, prefix + "\uffff"),
+    )
+    return {user_id for (user_id,) in rows}
+
+
+def max_username_suffix(base: str) -> int:
+    """Highest N among usernames of the form <base><N> (0 if none)."""
+    # base is alphanumerics and dots, so it has no GLOB metacharacters
+    rows = _connect().execute("SELECT username FROM users WHERE username GLOB ?", (base + "[0-9]*",))
+    best = 0
+    for (name,) in rows:
+        tail = name[len(base):]
+        # isdigit() alone also accepts e.g. "²", which int() rejects
+        if tail.isascii() and tail.isdigit():
+            best = max(best, int(tail))
+    return best
+
+
+def list_users() -> List[Dict[str, Any]]:
+    return [dict(row) for row in _connect().execute(f"{_SELECT} ORDER BY created_at")]
+
+
+# -------------------------
+# Writes
+# -------------------------
+def insert_user(user: Dict[str, Any]) -> None:
+    """
+    Insert a new user. An email clash raises EmailTakenError; a username/user_id clash
+    propagates as sqlite3.IntegrityError so the caller can regenerate them and retry.
+    """
+    try:
+        _connect().execute(
+            f"INSERT INTO users ({', '.join(USER_FIELDS)}, email_lower) "
+            f"VALUES ({', '.join('?' for _ in USER_FIELDS)}, ?)",
+            [user.get(k) for k in USER_FIELDS] + [user["email"].lower()],
+        )
+    except sqlite3.IntegrityError as e:
+        if "users.email_lower" in str(e):
+            raise EmailTakenError(user["email"]) from e
+        raise
+
+
+def _update_where(column: str, value, fields: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+    """UPDATE the given columns of the user matching column = value; return the updated user."""
+    unknown = set(fields) - set(USER_FIELDS)
+    if unknown:
+        raise ValueError(f"Unknown user fields: {sorted(unknown)}")
+    if "email" in fields:
+        fields["email_lower"] = fields["email"].lower()
+    assignments = ", ".join(f"{k} = ?" for k in fields)
+    with _transaction() as conn:
+        # resolve the user_id first so the re-read still works if the update changes `column`
+        found = conn.execute(f"SELECT user_id FROM users WHERE {column} = ?", (value,)).fetchone()
+        if found is None:
+            return None
+        user_id = found[0]
+        conn.execute(f"UPDATE users SET {assignments} WHERE user_id = ?", [*fields.values(), user_id])
+        row = conn.execute(f"{_SELECT} WHERE user_id = ?", (user_id,)).fetchone()
+    return _row_to_user(row)
+
+
+def update_user(user_id: str, **fields) -> bool:
+    """Update the given columns of one user. Returns False if no such user."""
+    return _update_where("user_id", user_id, fields) is not None
+
+
+def update_user_by_email(email: str, **fields) -> Optional[Dict[str, Any]]:
+    """Update the user with this email (case-insensitive) in one transaction; None if no such user."""
+    return _update_where("email_lower", email.lower(), fields)
+
+
+def increment_failed_logins(user_id: str) -> int:
+    """Atomically bump failed_logins and return the new count."""
+    with _transaction() as conn:
+        conn.execute("UPDATE users SET failed_logins = failed_logins + 1 WHERE user_id = ?", (user_id,))
+        row = conn.execute("SELECT failed_logins FROM users WHERE user_id = ?", (user_id,)).fetchone()
+    return row[0] if row is not None else 0
+
+
+if __name__ == "__main__":
+    _connect().execute(SCHEMA)
+    count = migrate_from_json(USERS_FILE)
+    print(f"Imported {count} user(s) from {USERS_FILE} into {USERS_DB}")
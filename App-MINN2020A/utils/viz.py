@@ -4,94 +4,182 @@ Simple visualization helper for the African Critical Minerals app.
 Generates Plotly charts for mineral production trends (2020–2024).
 """
 
-import json
 import os
-import pandas as pd
-import plotly.graph_objs as go
+import uuid
+from functools import lru_cache
+import orjson
 from config import DATA_DIR
 
+# numpy / pandas / plotly.io are imported inside the chart helpers so that importing
+# this module (e.g. for load_minerals_json) doesn't pay their startup cost and RSS.
 
-def load_minerals_json():
-    """Load minerals data from the JSON file."""
-    path = os.path.join(DATA_DIR, "minerals.json")
-    with open(path, "r", encoding="utf-8") as f:
-        data = json.load(f)
+MINERALS_FILE = os.path.join(DATA_DIR, "minerals.json")
+
+
+def minerals_mtime_ns():
+    """Cache key for everything derived from minerals.json."""
+    return os.stat(MINERALS_FILE).st_mtime_ns
+
+
+@lru_cache(maxsize=4)
+def _load_minerals(mtime_ns):
+    with open(MINERALS_FILE, "rb") as f:
+        data = orjson.loads(f.read())
     return data.get("minerals", [])
 
 
-def get_production_dataframe():
-    """Convert the production_history arrays into a DataFrame for all minerals."""
-    minerals = load_minerals_json()
-    rows = []
-    for m in minerals:
+def load_minerals_json():
+    """Load minerals data from the JSON file (cached until the file changes)."""
+    return _load_minerals(minerals_mtime_ns())
+
+
+@lru_cache(maxsize=4)
+def _production_columns(mtime_ns):
+    """Flatten every production_history entry into parallel NumPy columns."""
+    import numpy as np
+    names, years, amounts, countries = [], [], [], []
+    for m in _load_minerals(mtime_ns):
         for entry in m.get("production_history", []):
             year = entry.get("year")
+            if year is None:
+                continue  # cannot be plotted (groupby drops it anyway)
             amount = entry.get("production_t") or entry.get("production_contained_t", 0)
-            rows.append({
-                "mineral": m["name"],
-                "year": year,
-                "production_t": amount,
-                "country": entry.get("country", "Unknown")
-            })
-    return pd.DataFrame(rows)
+            names.append(m["name"])
+            years.append(year)
+            amounts.append(amount)
+            countries.append(entry.get("country", "Unknown"))
+    return {
+        "mineral": np.array(names, dtype=object),
+        "year": np.array(years, dtype=np.int16),
+        "production_t": np.array(amounts, dtype=np.float64),
+        "country": np.array(countries, dtype=object),
+    }
+
+
+@lru_cache(maxsize=4)
+def _production_dataframe(mtime_ns):
+    import pandas as pd
+    return pd.DataFrame(_production_columns(mtime_ns))
+
+
+def get_production_dataframe():
+    """Convert the production_history arrays into a DataFrame for all minerals."""
+    return _production_dataframe(minerals_mtime_ns())
 
 
 def generate_mineral_chart(mineral_name):
     """Generate a Plotly line chart for the selected mineral."""
-    df = get_production_dataframe()
+    return _mineral_html(mineral_name, minerals_mtime_ns())
+
+
+@lru_cache(maxsize=64)
+def _mineral_html(mineral_name, mtime_ns):
+    fig = _build_mineral_figure(mineral_name, mtime_ns)
+    if fig is None:
+        return "<p>No production data available for this mineral.</p>"
+    return _render(fig)
+
+
+def _build_mineral_figure(mineral_name, mtime_ns):
+    """Plotly figure dict (data + layout) for one mineral, or None if it has no data."""
+    df = _production_dataframe(mtime_ns)
     df = df[df["mineral"] == mineral_name]
 
     if df.empty:
-        return "<p>No production data available for this mineral.</p>"
+        return None
 
     # Aggregate by year in case of multiple countries
     df = df.groupby("year", as_index=False)["production_t"].sum()
 
-    fig = go.Figure()
-    fig.add_trace(go.Scatter(
-        x=df["year"],
-        y=df["production_t"],
-        mode="lines+markers",
-        line=dict(width=3, color="#007bff"),
-        marker=dict(size=8),
-        name=mineral_name
-    ))
-    fig.update_layout(
-        title=f"{mineral_name} Production (2020–2024)",
-        xaxis_title="Year",
-        yaxis_title="Production (tonnes)",
-        template="plotly_white",
-        margin=dict(l=40, r=20, t=60, b=40)
-    )
-
-    return fig.to_html(full_html=False, include_plotlyjs="cdn")
+    return {
+        "data": [{
+            "type": "scatter",
+            "x": df["year"].tolist(),
+            "y": df["production_t"].tolist(),
+            "mode": "lines+markers",
+            "line": {"width": 3, "color": "#007bff"},
+            "marker": {"size": 8},
+            "name": mineral_name,
+        }],
+        "layout": {
+            "title": {"text": f"{mineral_name} Production (2020–2024)"},
+            "xaxis": {"title": {"text": "Year"}},
+            "yaxis": {"title": {"text": "Production (tonnes)"}},
+            "margin": {"l": 40, "r": 20, "t": 60, "b": 40},
+        },
+    }
 
 
 def generate_overview_chart():
     """Create a multi-line chart comparing all minerals' total production."""
-    df = get_production_dataframe()
-    if df.empty:
+    return _overview_html(minerals_mtime_ns())
+
+
+@lru_cache(maxsize=4)
+def _overview_html(mtime_ns):
+    fig = _build_overview_figure(mtime_ns)
+    if fig is None:
         return "<p>No data available.</p>"
+    return _render(fig)
+
+
+def _build_overview_figure(mtime_ns):
+    """Plotly figure dict with one trace per mineral, or None if there is no data."""
+    df = _production_dataframe(mtime_ns)
+    if df.empty:
+        return None
 
     grouped = df.groupby(["year", "mineral"], as_index=False)["production_t"].sum()
 
-    fig = go.Figure()
+    traces = []
     for mineral in grouped["mineral"].unique():
         sub = grouped[grouped["mineral"] == mineral]
-        fig.add_trace(go.Scatter(
-            x=sub["year"],
-            y=sub["production_t"],
-            mode="lines+markers",
-            name=mineral
-        ))
-
-    fig.update_layout(
-        title="African Critical Minerals Production (2020–2024)",
-        xaxis_title="Year",
-        yaxis_title="Production (tonnes)",
-        legend_title="Mineral",
-        template="plotly_white",
-        margin=dict(l=40, r=20, t=60, b=40)
+        traces.append({
+            "type": "scatter",
+            "x": sub["year"].tolist(),
+            "y": sub["production_t"].tolist(),
+            "mode": "lines+markers",
+            "name": mineral,
+        })
+
+    return {
+        "data": traces,
+        "layout": {
+            "title": {"text": "African Critical Minerals Production (2020–2024)"},
+            "xaxis": {"title": {"text": "Year"}},
+            "yaxis": {"title": {"text": "Production (tonnes)"}},
+            "legend": {"title": {"text": "Mineral"}},
+            "margin": {"l": 40, "r": 20, "t": 60, "b": 40},
+        },
+    }
+
+
+@lru_cache(maxsize=1)
+def _plotly_assets():
+    """plotly.js CDN url and the plotly_white template as JSON (plotly.js has no named templates)."""
+    import plotly.io as pio
+    from plotly.offline import get_plotlyjs_version
+    cdn_url = f"https://cdn.plot.ly/plotly-{get_plotlyjs_version()}.min.js"
+    return cdn_url, pio.templates["plotly_white"].to_plotly_json()
+
+
+def _to_script_json(obj):
+    # "</" would let a string close the surrounding <script> tag
+    return orjson.dumps(obj).replace(b"</", b"<\\/").decode("utf-8")
+
+
+def _render(fig):
+    """
+    Emit the same snippet as fig.to_html(full_html=False, include_plotlyjs="cdn")
+    straight from the figure dict, skipping go.Figure validation and plotly's JSON encoder.
+    """
+    cdn_url, template = _plotly_assets()
+    layout = dict(fig["layout"], template=template)
+    div_id = uuid.uuid4().hex
+    return (
+        f'<div><script src="{cdn_url}" charset="utf-8"></script>'
+        f'<div id="{div_id}" class="plotly-graph-div" style="height:100%; width:100%;"></div>'
+        f'<script type="text/javascript">'
+        f'Plotly.newPlot("{div_id}", {_to_script_json(fig["data"])}, {_to_script_json(layout)}, {{"responsive": true}});'
+        f'</script></div>'
     )
-
-    return fig.to_html(full_html=False, include_plotlyjs="cdn")